@@ -6,20 +6,42 @@ Find Naturstyrelsen shelters that actually have availability.
 - Uses ONLY the real per-shelter PlaceID (ignores FTypeID 3012/3031/3091)
 - Caches resolved place IDs to avoid re-scraping detail pages
 - Region filters via presets (Sjælland, Fyn, Jylland, Bornholm, Lolland-Falster, Møn, Amager)
+- Distance filter around a point (--near LAT,LNG --radius-km)
 - Probe mode, max-places limiter, quiet mode
 - CSV ordered for mapping (lat,lng first) and includes `region` column
+- Concurrent HTTP (httpx + asyncio, one pooled client; HTTP/2 if h2 is installed),
+  bounded by --concurrency and paced by a token-bucket --rate limit
+- Requirements: see requirements.txt
 """
 
 import argparse
+import asyncio
 import csv
+import importlib.util
 import json
 import os
+import random
 import re
+import sqlite3
+import sys
 import time
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Set, Tuple
 
-import requests
+import httpx
+import numpy as np
+
+try:
+    import orjson  # optional: C JSON parser/encoder for API responses and caches
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); without it, stay on HTTP/1.1
+HTTP2 = importlib.util.find_spec("h2") is not None
 
 BASE = "https://book.naturstyrelsen.dk"
 API_PLACES = f"{BASE}/includes/branding_files/shelterbooking/includes/inc_ajaxbookingplaces.asp"
@@ -28,6 +50,33 @@ API_BOOKINGS = f"{BASE}/includes/branding_files/shelterbooking/includes/inc_ajax
 # Type/category ids we must NOT treat as place ids
 TYPE_IDS: Set[int] = {3012, 3031, 3091}
 
+# Booking lists change as people book; don't reuse cached ones for longer than this
+BOOKINGS_TTL = 3600
+
+# Transient failures (timeouts, dropped connections, 429/5xx) are retried with
+# jittered exponential backoff before a place is given up on
+RETRY_ATTEMPTS = 4
+RETRY_STATUS: Set[int] = {429, 500, 502, 503, 504}
+
+# Max in-flight requests per phase (ID resolution, availability checks)
+CONCURRENCY = 8
+
+# Listing pages fetched speculatively per round (the page count isn't known up front)
+PAGE_BATCH = 5
+
+# Sustained request rate to the site (requests/second); short bursts may exceed it
+RATE = 8.0
+
+@dataclass(slots=True)
+class Place:
+    """One shelter from the list API (slotted: attribute access, no per-row dict)."""
+    title: str
+    url: str
+    place_id: Optional[int]
+    lat: Optional[float]
+    lng: Optional[float]
+    region: str
+
 # --------------------------------------------------------------------
 # Region presets (bounding boxes): lat_min, lat_max, lon_min, lon_max
 # ASCII aliases handled below (e.g., sjaelland -> sjælland).
@@ -52,82 +101,197 @@ REGION_ALIASES: Dict[str, str] = {
     "amager": "amager",
 }
 
-def normalize_ascii(s: str) -> str:
-    s = s.strip().lower()
-    # normalize Danish letters to ascii-friendly forms
-    s = (s
-         .replace("æ", "ae")
-         .replace("ø", "oe")
-         .replace("å", "aa"))
-    # also strip spaces and hyphens for alias lookup convenience
-    return s.replace(" ", "").replace("_", "").replace("-", "")
+# Danish letters -> ascii-friendly forms; also strip spaces, underscores and
+# hyphens for alias lookup convenience
+_ASCII_TABLE = str.maketrans({"æ": "ae", "ø": "oe", "å": "aa", " ": None, "_": None, "-": None})
 
+@lru_cache(maxsize=None)
+def normalize_ascii(s: str) -> str:
+    return s.strip().lower().translate(_ASCII_TABLE)
+
+def _substring_index(names: Dict[str, str]) -> Dict[str, str]:
+    """Every substring of every name -> its canonical key (first name wins)."""
+    index: Dict[str, str] = {}
+    for name, canonical in names.items():
+        for i in range(len(name) + 1):
+            for j in range(i, len(name) + 1):
+                index.setdefault(name[i:j], canonical)
+    return index
+
+# Built once at import so resolving a region is a couple of dict lookups:
+# exact keys/aliases (raw or ascii-normalized), then partial names ("falster", "sjæl")
+CANONICAL_INDEX: Dict[str, str] = {k: k for k in REGION_PRESETS}
+for _alias, _key in REGION_ALIASES.items():
+    CANONICAL_INDEX.setdefault(_alias, _key)
+    CANONICAL_INDEX.setdefault(normalize_ascii(_alias), _key)
+_PRESET_SUBSTRINGS = _substring_index({k: k for k in REGION_PRESETS})
+_ALIAS_SUBSTRINGS = _substring_index(REGION_ALIASES)
+
+@lru_cache(maxsize=256)
 def resolve_region_name(user_input: str) -> Optional[str]:
     """Map user-provided string to a canonical preset key, if possible."""
     raw = user_input.strip().lower()
-    if raw in REGION_PRESETS:
-        return raw
-    # try ascii alias lookup
     norm = normalize_ascii(raw)
-    if norm in REGION_ALIASES:
-        return REGION_ALIASES[norm]
-    # loose contains matching on canonical keys
+    hit = CANONICAL_INDEX.get(raw) or CANONICAL_INDEX.get(norm) or _PRESET_SUBSTRINGS.get(raw)
+    if hit:
+        return hit
+    # input that contains a canonical key (e.g. "sjælland nord")
     for key in REGION_PRESETS.keys():
-        if raw in key or key in raw:
+        if key in raw:
             return key
-    # loose contains matching on aliases
+    hit = _ALIAS_SUBSTRINGS.get(norm)
+    if hit:
+        return hit
+    # input that contains an alias
     for alias, key in REGION_ALIASES.items():
-        if norm in alias or alias in norm:
+        if alias in norm:
             return key
     return None
+
+def place_columns(places: List[Place]) -> Tuple[np.ndarray, np.ndarray]:
+    """Lat/lng as aligned float columns (NaN where missing) for vectorized filters."""
+    lats = np.fromiter((np.nan if p.lat is None else p.lat for p in places), float, len(places))
+    lngs = np.fromiter((np.nan if p.lng is None else p.lng for p in places), float, len(places))
+    return lats, lngs
+
+def match_regions(lats: np.ndarray, lngs: np.ndarray, regions: List[str]) -> np.ndarray:
+    """Index into `regions` of the first preset bbox containing each row, or -1."""
+    matched = np.full(len(lats), -1)
+    for k, key in enumerate(regions):
+        lat_min, lat_max, lon_min, lon_max = REGION_PRESETS[key]
+        # NaN (missing coords) compares False, so those rows never match
+        hit = (lats >= lat_min) & (lats <= lat_max) & (lngs >= lon_min) & (lngs <= lon_max)
+        matched[hit & (matched < 0)] = k
+    return matched
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine(lat: np.ndarray, lng: np.ndarray, lat0: float, lng0: float) -> np.ndarray:
+    """Great-circle distance (km) from (lat0, lng0) to every row; NaN coords give NaN."""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lat0)
+    dphi = phi2 - phi1
+    dl = np.radians(lng0 - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def parse_point(value: str) -> Tuple[float, float]:
+    """argparse type for "LAT,LNG"."""
+    try:
+        lat, lng = (float(x) for x in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LNG (e.g. 55.68,12.57), got '{value}'")
+    return lat, lng
 # --------------------------------------------------------------------
 
 # ---------------------- HTTP helpers ----------------------
-def make_session():
-    s = requests.Session()
-    s.headers.update({
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
-        "Accept": "application/json, text/javascript, */*; q=0.1",
-        "Accept-Language": "da-DK,da;q=0.9,en-US;q=0.8,en;q=0.7",
-        "Referer": f"{BASE}/soeg/?s1=3012",
-    })
+def guess_encoding(content: bytes) -> str:
+    """Charset for responses that don't declare one: UTF-8 if it decodes, else cp1252 (Latin-1 superset)."""
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+class RateLimiter:
+    """
+    Token bucket shared by every request: lets up to `rate` requests through at
+    once, then holds the sustained pace to `rate` per second.
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.set_rate(rate)
+        self._next = 0.0  # when the bucket is next empty
+
+    def set_rate(self, rate: float) -> None:
+        self.interval = 1.0 / rate
+        self.burst = max(1.0, rate) * self.interval
+
+    async def __aenter__(self) -> None:
+        now = time.monotonic()
+        start = max(self._next, now)
+        # Reserve our slot before sleeping so concurrent callers queue behind it
+        self._next = start + self.interval
+        delay = start + self.interval - now - self.burst
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+LIMITER = RateLimiter(RATE)
+
+async def make_client() -> httpx.AsyncClient:
+    # One pooled client for the whole run: with HTTP/2 in-flight requests share
+    # the same TLS connection instead of each paying for a handshake.
+    c = httpx.AsyncClient(
+        http2=HTTP2,
+        follow_redirects=True,  # like requests.Session; the JSON endpoints may redirect too
+        default_encoding=guess_encoding,  # httpx would otherwise assume UTF-8 and mangle æ/ø/å
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        headers={
+            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+            "Accept": "application/json, text/javascript, */*; q=0.1",
+            "Accept-Language": "da-DK,da;q=0.9,en-US;q=0.8,en;q=0.7",
+            "Referer": f"{BASE}/soeg/?s1=3012",
+        },
+    )
     # Warm cookies (site sometimes expects a session)
     try:
-        s.get(BASE + "/", timeout=15)
-        s.get(f"{BASE}/soeg/?s1=3012", timeout=15)
+        await c.get(BASE + "/", timeout=15)
+        await c.get(f"{BASE}/soeg/?s1=3012", timeout=15)
     except Exception:
         pass
-    return s
+    return c
 
-def get_json(session: requests.Session, url: str, params: Dict[str, Any]) -> Any:
+async def get_with_retries(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        try:
+            async with LIMITER:
+                r = await client.get(url, **kwargs)
+            if r.status_code not in RETRY_STATUS or attempt == RETRY_ATTEMPTS:
+                return r
+        except httpx.TransportError:
+            if attempt == RETRY_ATTEMPTS:
+                raise
+        await asyncio.sleep(random.uniform(0, min(3.0, 0.3 * 2 ** attempt)))
+
+async def fetch_json(client: httpx.AsyncClient, url: str, params: Dict[str, Any]) -> Any:
     headers = {"X-Requested-With": "XMLHttpRequest", "Referer": f"{BASE}/soeg/?s1=3012"}
-    r = session.get(url, params=params, headers=headers, timeout=30)
+    r = await get_with_retries(client, url, params=params, headers=headers, timeout=30)
     r.raise_for_status()
     try:
-        return r.json()
+        return json_loads(r.content)
     except Exception:
+        # Non-UTF-8 body (the site may answer in Latin-1): r.text decodes with the
+        # declared charset, or via guess_encoding when the server sends none
         text = r.text.strip()
         if text.startswith("{") and text.endswith("}"):
-            return json.loads(text)
+            return json_loads(text)
         raise
 
-def http_get_page(session: requests.Session, url: str) -> str:
+async def fetch_html(client: httpx.AsyncClient, url: str) -> str:
+    r = await get_with_retries(client, url, timeout=15)
+    r.raise_for_status()
+    return r.text
+
+async def http_get_page(client: httpx.AsyncClient, url: str) -> str:
     # Ensure trailing slash for /sted/ pages (prevents 404s)
     if url.startswith(f"{BASE}/sted/") and not url.endswith("/"):
         url = url + "/"
-    r = session.get(url, timeout=15, allow_redirects=True)
-    if r.status_code == 404 and not url.endswith("/"):
-        r = session.get(url + "/", timeout=15, allow_redirects=True)
-    r.raise_for_status()
-    return r.text
+    return await fetch_html(client, url)
 
 # ---------------------- ID extraction ----------------------
-ID_REGEXES = [
-    re.compile(r"inc_ajaxgetbookingsforsingleplace\.asp\?i=(\d+)", re.I),
-    re.compile(r'data-place-id\s*=\s*"(\d+)"', re.I),
-    re.compile(r'place[_\s-]*id\s*[:=]\s*"?(\d+)"?', re.I),
-    re.compile(r'[?&]i=(\d+)', re.I),
-]
+# One alternation (one scan per page) instead of a regex per pattern. Groups are
+# ranked a < b < c < d, the old pattern order, so a page with several candidates
+# still yields the same id as searching each pattern in turn.
+ID_RE = re.compile(
+    r'(?:inc_ajaxgetbookingsforsingleplace\.asp\?i=(?P<a>\d+))'
+    r'|(?:data-place-id\s*=\s*"(?P<b>\d+)")'
+    r'|(?:place[_\s-]*id\s*[:=]\s*"?(?P<c>\d+))'
+    r'|(?:[?&]i=(?P<d>\d+))',
+    re.I,
+)
 
 def extract_place_id_from_row(row: dict) -> Optional[int]:
     """Only accept the real per-shelter PlaceID (ignore type/category ids)."""
@@ -141,115 +305,250 @@ def extract_place_id_from_row(row: dict) -> Optional[int]:
         return None
 
 def extract_place_id_from_html(html: str) -> Optional[int]:
-    for rgx in ID_REGEXES:
-        m = rgx.search(html)
-        if m:
-            try:
-                return int(m.group(1))
-            except Exception:
-                pass
-    return None
+    best_rank, best = len(ID_RE.groupindex), None
+    for m in ID_RE.finditer(html):
+        rank = m.lastindex - 1  # each alternative holds exactly one group
+        if rank < best_rank:
+            best_rank, best = rank, m.group(m.lastindex)
+            if rank == 0:
+                break  # the booking-endpoint link outranks everything
+    return int(best) if best else None
 
 # ---------------------- Cache helpers ----------------------
-def load_cache(path: str) -> Dict[str, int]:
+def load_json_cache(path: str) -> Dict[str, int]:
+    """Read a legacy ids_cache.json (url -> place_id); used once to seed the SQLite cache."""
     if not path or not os.path.exists(path):
         return {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = json_loads(f.read())
             # keep only int values
             return {k: int(v) for k, v in data.items() if isinstance(v, (int, str)) and str(v).isdigit()}
     except Exception:
         return {}
 
-def save_cache(path: str, cache: Dict[str, int]) -> None:
+def open_cache(path: str) -> Optional[sqlite3.Connection]:
+    """
+    Open (creating if needed) the SQLite ID cache. Each resolved id is written as
+    its own row, so a crash mid-run keeps everything resolved so far.
+    A legacy JSON cache next to it (same name, .json) is imported on first use;
+    passing a .json path directly uses the sibling .sqlite file.
+    """
+    if not path:
+        return None
+    root, ext = os.path.splitext(path)
+    if ext == ".json":
+        path = root + ".sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS ids(url TEXT PRIMARY KEY, pid INTEGER)")
+    if conn.execute("SELECT 1 FROM ids LIMIT 1").fetchone() is None:
+        legacy = load_json_cache(root + ".json")
+        if legacy:
+            conn.executemany("INSERT OR REPLACE INTO ids(url, pid) VALUES (?, ?)", legacy.items())
+            conn.commit()
+            print(f"Imported {len(legacy)} cached place IDs from {root}.json")
+    return conn
+
+def load_cache(conn: Optional[sqlite3.Connection]) -> Dict[str, int]:
+    if conn is None:
+        return {}
+    return {url: pid for url, pid in conn.execute("SELECT url, pid FROM ids") if pid is not None}
+
+def record_place_id(conn: Optional[sqlite3.Connection], url: str, pid: int) -> None:
+    if conn is not None:
+        conn.execute("INSERT OR REPLACE INTO ids(url, pid) VALUES (?, ?)", (url, pid))
+
+def load_bookings_cache(path: str, ttl: float = BOOKINGS_TTL) -> Dict[str, Dict[str, Any]]:
+    """Load "<place_id>:<yyyymmdd>" -> {"t": fetched_at, "dates": [...]}, dropping stale entries."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            data = json_loads(f.read())
+        cutoff = time.time() - ttl
+        return {k: v for k, v in data.items()
+                if isinstance(v, dict) and v.get("t", 0) >= cutoff and isinstance(v.get("dates"), list)}
+    except Exception:
+        return {}
+
+def save_bookings_cache(path: str, cache: Dict[str, Dict[str, Any]]) -> None:
     if not path:
         return
     tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(cache, f, ensure_ascii=False, indent=2)
+    if orjson is not None:
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(cache))
+    else:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, separators=(",", ":"))
     os.replace(tmp, path)
 
 # ---------------------- API wrappers ----------------------
-def fetch_all_places(session: requests.Session, page_size=200, max_pages=500) -> List[Dict[str, Any]]:
-    """Pull all shelters from the list API (t=1)."""
+async def fetch_all_places(client: httpx.AsyncClient, page_size=200, max_pages=500,
+                           batch=PAGE_BATCH) -> List[Place]:
+    """
+    Pull all shelters from the list API (t=1).
+    Pages are requested `batch` at a time; the first empty or short page ends
+    the listing, and requests still running for pages past it are cancelled.
+    """
     places = []
-    for p in range(1, max_pages + 1):
-        data = get_json(session, API_PLACES, {"pid": 0, "p": p, "r": 50000, "ps": page_size, "t": 1})
-        rows = data.get("BookingPlacesList", [])
-        if not rows:
-            break
-        for c in rows:
-            uri = (c.get("Uri") or "").strip().strip("/")
-            if not uri:
-                continue
-            pid = extract_place_id_from_row(c)  # strict
-            # Coordinates can be in DoubleLat/DoubleLng or Lat/Lng
-            lat = c.get("DoubleLat", c.get("Lat"))
-            lng = c.get("DoubleLng", c.get("Lng"))
-            try:
-                lat = float(lat) if lat not in (None, "",) else None
-                lng = float(lng) if lng not in (None, "",) else None
-            except Exception:
-                lat = lng = None
-            region = c.get("RegionName") or ""  # often missing; keep empty string
-            places.append({
-                "title": c.get("Title") or uri.replace("-", " ").title(),
-                "url": f"{BASE}/sted/{uri}/",
-                "place_id": pid,
-                "lat": lat,
-                "lng": lng,
-                "region": region,
-            })
-        if len(rows) < page_size:
-            break
-        time.sleep(0.15)
+    for first in range(1, max_pages + 1, batch):
+        pages = range(first, min(first + batch, max_pages + 1))
+        tasks = [asyncio.create_task(
+            fetch_json(client, API_PLACES, {"pid": 0, "p": p, "r": 50000, "ps": page_size, "t": 1})
+        ) for p in pages]
+        try:
+            for task in tasks:
+                data = await task
+                rows = data.get("BookingPlacesList", [])
+                if not rows:
+                    return places
+                for c in rows:
+                    uri = (c.get("Uri") or "").strip().strip("/")
+                    if not uri:
+                        continue
+                    pid = extract_place_id_from_row(c)  # strict
+                    # Coordinates can be in DoubleLat/DoubleLng or Lat/Lng
+                    lat = c.get("DoubleLat", c.get("Lat"))
+                    lng = c.get("DoubleLng", c.get("Lng"))
+                    try:
+                        lat = float(lat) if lat not in (None, "",) else None
+                        lng = float(lng) if lng not in (None, "",) else None
+                    except Exception:
+                        lat = lng = None
+                    region = c.get("RegionName") or ""  # often missing; keep empty string
+                    places.append(Place(
+                        title=c.get("Title") or uri.replace("-", " ").title(),
+                        url=f"{BASE}/sted/{uri}/",
+                        place_id=pid,
+                        lat=lat,
+                        lng=lng,
+                        region=region,
+                    ))
+                if len(rows) < page_size:
+                    return places
+        finally:
+            # Pages past the end may still be sitting in 5xx retry backoff;
+            # don't wait for them (gather just reaps the cancellations)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
     return places
 
-def ensure_place_ids(session: requests.Session,
-                     places: List[Dict[str, Any]],
-                     cache: Dict[str, int],
-                     refresh_cache: bool = False) -> int:
+async def resolve_one(client: httpx.AsyncClient,
+                      p: Place,
+                      sem: asyncio.Semaphore,
+                      cache: Dict[str, int],
+                      conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Scrape one detail page for its place id; `sem` bounds pages in flight."""
+    url = p.url
+    async with sem:
+        try:
+            html = await http_get_page(client, url)
+        except Exception as e:
+            print(f"  Could not fetch {url}: {e}")
+            return False
+    pid = extract_place_id_from_html(html)
+    if pid and pid not in TYPE_IDS:
+        p.place_id = pid
+        cache[url] = pid
+        record_place_id(conn, url, pid)
+        return True
+    return False
+
+async def ensure_place_ids(client: httpx.AsyncClient,
+                           places: List[Place],
+                           cache: Dict[str, int],
+                           refresh_cache: bool = False,
+                           concurrency: int = CONCURRENCY,
+                           conn: Optional[sqlite3.Connection] = None) -> int:
     """
     For any place missing a valid place_id (or where the id matches a known type id),
     use cache if present; otherwise fetch detail page and extract id; update cache.
+    Newly resolved ids are also written to `conn` (committed every 20 places).
     Resolves ONLY for provided `places` subset (already limited by caller).
+    Detail pages are fetched concurrently, at most `concurrency` at a time.
     """
-    targets = [p for p in places if (p.get("place_id") is None) or (p.get("place_id") in TYPE_IDS)]
+    targets = [p for p in places if (p.place_id is None) or (p.place_id in TYPE_IDS)]
     fixed = 0
-    for idx, p in enumerate(targets, 1):
-        url = p["url"]
-        # 1) cache hit?
+    # 1) cache hits need no request
+    to_fetch = []
+    for p in targets:
+        url = p.url
         if not refresh_cache and url in cache and cache[url] not in TYPE_IDS:
-            p["place_id"] = cache[url]
+            p.place_id = cache[url]
             fixed += 1
         else:
-            # 2) scrape page
-            try:
-                html = http_get_page(session, url)
-                pid = extract_place_id_from_html(html)
-                if pid and pid not in TYPE_IDS:
-                    p["place_id"] = pid
-                    cache[url] = pid
-                    fixed += 1
-            except Exception:
-                pass
-        if idx % 20 == 0:
-            print(f"  …resolved {fixed}/{idx} (of {len(targets)})")
-        time.sleep(0.05)
-    return fixed
+            to_fetch.append(p)
+
+    # 2) scrape the rest concurrently
+    sem = asyncio.Semaphore(concurrency)
+    done = 0
 
-def fetch_booked_dates(session: requests.Session, place_id: int, on_date: datetime):
-    data = get_json(session, API_BOOKINGS, {"i": place_id, "d": on_date.strftime("%Y%m%d")})
-    return set(str(x) for x in data.get("BookingDates", []) if x)
+    async def tracked(p: Place) -> None:
+        nonlocal done, fixed
+        if await resolve_one(client, p, sem, cache, conn):
+            fixed += 1
+        done += 1
+        if done % 20 == 0:
+            if conn is not None:
+                conn.commit()
+            print(f"  …resolved {fixed}/{len(targets) - len(to_fetch) + done} (of {len(targets)})")
+
+    await asyncio.gather(*[tracked(p) for p in to_fetch])
+    if conn is not None:
+        conn.commit()
+    return fixed
 
-def is_available(session: requests.Session, place_id: int, start_date: datetime, nights: int, quiet=False) -> bool:
-    needed = [(start_date + timedelta(days=i)).date().isoformat() for i in range(nights)]
-    booked = fetch_booked_dates(session, place_id, start_date)
-    hits = [d for d in needed if d in booked]
-    if not quiet:
-        print(f"  place_id={place_id} needs={needed} booked_hits={hits} booked_count={len(booked)}")
-    return len(hits) == 0
+# In-process (L1) memo of booking lists for this run; the bookings cache file is L2.
+# Holds the task rather than its result so concurrent callers for the same key
+# share one request; failed tasks are dropped so errors aren't memoized.
+_booked: Dict[Tuple[int, str], "asyncio.Task[frozenset]"] = {}
+
+def booking_key(place_id: int, on_date: datetime) -> Tuple[int, str]:
+    return int(place_id), on_date.strftime("%Y%m%d")
+
+async def _load_booked_dates(client: httpx.AsyncClient, key: Tuple[int, str],
+                             bookings_cache: Optional[Dict[str, Dict[str, Any]]]) -> frozenset:
+    disk_key = f"{key[0]}:{key[1]}"
+    if bookings_cache is not None and disk_key in bookings_cache:
+        return frozenset(map(sys.intern, bookings_cache[disk_key]["dates"]))
+    data = await fetch_json(client, API_BOOKINGS, {"i": key[0], "d": key[1]})
+    # Interned: the same few hundred date strings recur across every shelter
+    booked = frozenset(sys.intern(str(x)) for x in data.get("BookingDates", []) if x)
+    if bookings_cache is not None:
+        bookings_cache[disk_key] = {"t": time.time(), "dates": sorted(booked)}
+    return booked
+
+def _forget_if_failed(key: Tuple[int, str], task: "asyncio.Task[frozenset]") -> None:
+    if (task.cancelled() or task.exception() is not None) and _booked.get(key) is task:
+        del _booked[key]
+
+async def fetch_booked_dates(client: httpx.AsyncClient, place_id: int, on_date: datetime,
+                             bookings_cache: Optional[Dict[str, Dict[str, Any]]] = None) -> frozenset:
+    """Booked dates for a place; served from this run's memo or `bookings_cache` (if given) when present."""
+    key = booking_key(place_id, on_date)
+    task = _booked.get(key)
+    if task is None:
+        task = asyncio.create_task(_load_booked_dates(client, key, bookings_cache))
+        task.add_done_callback(lambda t: _forget_if_failed(key, t))
+        _booked[key] = task
+    # Shielded: one caller being cancelled mustn't cancel the request others wait on
+    return await asyncio.shield(task)
+
+async def is_available(client: httpx.AsyncClient, place_id: int, start_date: datetime, nights: int, quiet=False,
+                       bookings_cache: Optional[Dict[str, Dict[str, Any]]] = None
+                       ) -> Tuple[bool, List[str], List[str], int]:
+    """
+    Return (available, needed nights, booked hits, booked count). Printing is left
+    to the caller so the debug line lands under the right shelter when checks run
+    concurrently; `hits` is only computed when not `quiet`.
+    """
+    base = start_date.date().toordinal()
+    needed = [sys.intern(date.fromordinal(base + i).isoformat()) for i in range(nights)]
+    booked = await fetch_booked_dates(client, place_id, start_date, bookings_cache)
+    hits = [] if quiet else [d for d in needed if d in booked]
+    return booked.isdisjoint(needed), needed, hits, len(booked)
 
 # ---------------------- CLI & main ----------------------
 def build_parser() -> argparse.ArgumentParser:
@@ -266,6 +565,9 @@ Examples:
   Limit to first 40 shelters (faster test run):
     python find_available_shelters.py --start 2025-09-07 --nights 1 --max-places 40
 
+  Only shelters within 30 km of a point (lat,lng):
+    python find_available_shelters.py --start 2025-09-07 --nights 1 --near 55.68,12.57 --radius-km 30
+
   List region presets:
     python find_available_shelters.py --list-regions
 
@@ -277,17 +579,23 @@ Examples:
     python find_available_shelters.py --start 2025-09-07 --nights 1 --probe 5
 
 Cache options:
-  --cache-file FILE   Path to persistent ID cache (default: ids_cache.json)
-  --no-cache          Do not load or save cache
-  --refresh-cache     Force re-fetch IDs for current subset even if cached
+  --cache-file FILE     Path to persistent ID cache (default: ids_cache.sqlite)
+  --bookings-cache FILE Path to booking-dates cache (default: bookings_cache.json)
+  --bookings-ttl SECS   Max age of cached booking dates (default: 3600)
+  --no-cache            Do not load or save either cache
+  --refresh-cache       Force re-fetch IDs for current subset even if cached
 
 Caching explained:
   The script sometimes needs to visit each shelter's detail page to extract the
   real booking PlaceID (the one used by the availability endpoint). Since this
-  ID rarely changes, we store it in a JSON cache so future runs can skip that
-  step. Use --no-cache to disable caching entirely, or --refresh-cache to
-  re-check the IDs for your current subset. You can relocate the cache file
-  with --cache-file.
+  ID rarely changes, we store it in a SQLite cache so future runs can skip that
+  step (an older ids_cache.json is imported automatically). Use --no-cache to
+  disable caching entirely, or --refresh-cache to re-check the IDs for your
+  current subset. You can relocate the cache file with --cache-file.
+
+  Booking dates per (place, start date) are cached too, but only for
+  --bookings-ttl seconds, so quick re-runs (e.g. after a network hiccup)
+  don't re-download lists that cannot have changed much.
 
 Region presets available:
   {", ".join(sorted(REGION_PRESETS.keys()))}
@@ -299,14 +607,20 @@ Region presets available:
     parser.add_argument("--nights", type=int, default=1, help="Number of nights (default: 1)")
     parser.add_argument("--filter", default="", help="Substring to match in the title (case-insensitive)")
     parser.add_argument("--region", action="append", default=[], help="Filter by region preset (can be used multiple times).")
+    parser.add_argument("--near", type=parse_point, metavar="LAT,LNG", help="Only places within --radius-km of this point")
+    parser.add_argument("--radius-km", type=float, default=25.0, help="Radius for --near in km (default: 25)")
     parser.add_argument("--list-regions", action="store_true", help="List region presets and exit")
     parser.add_argument("--max-places", type=int, default=0, help="Only check first N places (for testing)")
     parser.add_argument("--quiet", action="store_true", help="Suppress per-place booked_hits prints")
     parser.add_argument("--probe", type=int, default=0, help="Print raw BookingDates for first N places and exit")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help=f"Max parallel requests (default: {CONCURRENCY})")
+    parser.add_argument("--rate", type=float, default=RATE, help=f"Max sustained requests per second (default: {RATE:g})")
     parser.add_argument("--out", default="available_shelters.csv", help="CSV output file (default: available_shelters.csv)")
     # cache controls
-    parser.add_argument("--cache-file", default="ids_cache.json", help="Path to ID cache file (default: ids_cache.json)")
-    parser.add_argument("--no-cache", action="store_true", help="Do not load or save cache")
+    parser.add_argument("--cache-file", default="ids_cache.sqlite", help="Path to ID cache file (default: ids_cache.sqlite)")
+    parser.add_argument("--bookings-cache", default="bookings_cache.json", help="Path to booking-dates cache file (default: bookings_cache.json)")
+    parser.add_argument("--bookings-ttl", type=float, default=BOOKINGS_TTL, help=f"Seconds to reuse cached booking dates (default: {BOOKINGS_TTL})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not load or save caches")
     parser.add_argument("--refresh-cache", action="store_true", help="Re-resolve IDs even if they exist in cache (for current subset)")
     return parser
 
@@ -325,9 +639,21 @@ def main():
         print("Error: --start is required (unless using --list-regions).")
         return
 
+    asyncio.run(main_async(args))
+
+async def main_async(args: argparse.Namespace) -> None:
+    LIMITER.set_rate(max(0.1, args.rate))
+    client = await make_client()
+    try:
+        await run_search(client, args)
+    finally:
+        await client.aclose()
+
+async def run_search(client: httpx.AsyncClient, args: argparse.Namespace) -> None:
     start_dt = datetime.strptime(args.start, "%Y-%m-%d")
     nights = max(1, int(args.nights))
     title_sub = args.filter.strip().lower()
+    concurrency = max(1, int(args.concurrency))
 
     # Resolve region preset names (allow multiple; OR filter)
     requested_regions: List[str] = []
@@ -340,108 +666,143 @@ def main():
     # Deduplicate
     requested_regions = sorted(set(requested_regions))
 
-    s = make_session()
-
     print("Collecting places from API…")
-    places = fetch_all_places(s)
+    places = await fetch_all_places(client)
     print(f"Fetched {len(places)} places")
 
+    # Filters work on lat/lng columns plus an index array of surviving rows;
+    # the Place rows themselves are only picked out once, at the end
+    lats, lngs = place_columns(places)
+    keep = np.arange(len(places))
+
     # Title filter
     if title_sub:
-        before = len(places)
-        places = [p for p in places if title_sub in p["title"].lower()]
-        print(f"Title filter '{args.filter}': {len(places)}/{before} remain.")
+        before = len(keep)
+        keep = keep[np.fromiter((title_sub in places[i].title.lower() for i in keep), bool, len(keep))]
+        print(f"Title filter '{args.filter}': {len(keep)}/{before} remain.")
 
     # Region bbox filter (OR across requested regions)
     if requested_regions:
-        before = len(places)
-        kept = []
-        for p in places:
-            lat, lng = p["lat"], p["lng"]
-            if lat is None or lng is None:
-                continue
-            for key in requested_regions:
-                lat_min, lat_max, lon_min, lon_max = REGION_PRESETS[key]
-                if lat_min <= lat <= lat_max and lon_min <= lng <= lon_max:
-                    # If API region is empty, fill with preset name we matched
-                    if not p["region"]:
-                        p["region"] = key
-                    kept.append(p)
-                    break
-        places = kept
-        print(f"Region filter {requested_regions}: {len(places)}/{before} remain.")
+        before = len(keep)
+        matched = match_regions(lats[keep], lngs[keep], requested_regions)
+        inside = matched >= 0
+        # If API region is empty, fill with the first preset name we matched
+        for i, k in zip(keep[inside], matched[inside]):
+            if not places[i].region:
+                places[i].region = requested_regions[k]
+        keep = keep[inside]
+        print(f"Region filter {requested_regions}: {len(keep)}/{before} remain.")
+
+    # Distance filter (NaN distance for missing coords compares False)
+    if args.near:
+        before = len(keep)
+        lat0, lng0 = args.near
+        keep = keep[haversine(lats[keep], lngs[keep], lat0, lng0) <= args.radius_km]
+        print(f"Within {args.radius_km:g} km of {lat0},{lng0}: {len(keep)}/{before} remain.")
 
     # Limit for faster test runs (apply BEFORE resolving IDs)
     if args.max_places > 0:
-        places = places[:args.max_places]
-        print(f"Limiting to first {len(places)} places for test run.")
+        keep = keep[:args.max_places]
+        print(f"Limiting to first {len(keep)} places for test run.")
+
+    places = [places[i] for i in keep]
 
     # Subset for ID resolution (probe only resolves as many as needed)
     subset = places[: args.probe or len(places) ]
 
-    # Load cache
-    cache: Dict[str, int] = {}
+    # Load caches
+    conn: Optional[sqlite3.Connection] = None
+    bookings_cache: Optional[Dict[str, Dict[str, Any]]] = None
     if not args.no_cache:
-        cache = load_cache(args.cache_file)
+        conn = open_cache(args.cache_file)
+        bookings_cache = load_bookings_cache(args.bookings_cache, ttl=args.bookings_ttl)
+    cache = load_cache(conn)
 
     # Ensure IDs for the subset
-    need_fix = [p for p in subset if (p.get("place_id") is None) or (p.get("place_id") in TYPE_IDS)]
+    need_fix = [p for p in subset if (p.place_id is None) or (p.place_id in TYPE_IDS)]
     if need_fix or args.refresh_cache:
         to_resolve = subset if args.refresh_cache else need_fix
         print(f"Resolving place IDs… ({len(to_resolve)} to resolve)")
-        fixed = ensure_place_ids(s, to_resolve, cache, refresh_cache=args.refresh_cache)
+        fixed = await ensure_place_ids(client, to_resolve, cache, refresh_cache=args.refresh_cache,
+                                       concurrency=concurrency, conn=conn)
         print(f"Resolved {fixed} place IDs.")
-        if not args.no_cache:
-            save_cache(args.cache_file, cache)
     else:
         print("All place IDs present and look valid for current subset.")
+    if conn is not None:
+        conn.close()
 
     # Probe mode (skip CSV, just show raw availability)
     if args.probe > 0:
         print(f"\nProbe first {min(args.probe, len(subset))} places on {start_dt.date()}:")
-        for p in subset[:args.probe]:
-            pid = p.get("place_id") or cache.get(p["url"])
+        probed = subset[:args.probe]
+        pids = [p.place_id or cache.get(p.url) for p in probed]
+        booked = await asyncio.gather(*[
+            fetch_booked_dates(client, pid, start_dt, bookings_cache) for pid in pids if pid and pid not in TYPE_IDS
+        ])
+        booked_iter = iter(booked)
+        for p, pid in zip(probed, pids):
             if not pid or pid in TYPE_IDS:
-                print(f"- {p['title']} (id MISSING)")
+                print(f"- {p.title} (id MISSING)")
                 continue
-            bd = fetch_booked_dates(s, pid, start_dt)
-            print(f"- {p['title']} (id {pid}): booked_count={len(bd)}  has {start_dt.date()}? {start_dt.date().isoformat() in bd}")
+            bd = next(booked_iter)
+            print(f"- {p.title} (id {pid}): booked_count={len(bd)}  has {start_dt.date()}? {start_dt.date().isoformat() in bd}")
+        if bookings_cache is not None:
+            save_bookings_cache(args.bookings_cache, bookings_cache)
         return
 
     # Availability checks
-    results = []
-    print(f"\nChecking availability for {len(places)} places on {start_dt.date()} for {nights} night(s)…")
-    for idx, p in enumerate(places, 1):
-        print(f"\n[{idx}/{len(places)}] {p['title']}  {p['url']}")
-        pid = p.get("place_id") or cache.get(p["url"])
+    sem = asyncio.Semaphore(concurrency)
+
+    async def check(p: Place) -> Tuple[Place, Optional[int], Any]:
+        pid = p.place_id or cache.get(p.url)
         if not pid or pid in TYPE_IDS:
-            print("  Skipping (missing or invalid place_id)")
-            continue
-        try:
-            time.sleep(0.25)  # be polite
-            if is_available(s, pid, start_dt, nights, quiet=args.quiet):
-                results.append({
-                    "lat": p["lat"],
-                    "lng": p["lng"],
-                    "region": p["region"],
-                    "name": p["title"],
-                    "url": p["url"],
-                    "place_id": pid,
-                })
-                print("  AVAILABLE ->", p["title"])
-            else:
-                print("  Not available for your range.")
-        except Exception as e:
-            print("  Error:", e)
+            return p, None, None
+        async with sem:
+            try:
+                return p, pid, await is_available(client, pid, start_dt, nights, quiet=args.quiet,
+                                                   bookings_cache=bookings_cache)
+            except Exception as e:
+                return p, pid, e
 
-    # Save CSV (lat,lng first; includes region)
+    print(f"\nChecking availability for {len(places)} places on {start_dt.date()} for {nights} night(s)…")
+    # CSV (lat,lng first; includes region) is written as hits arrive, so an
+    # interrupted run still leaves every AVAILABLE row found so far
+    found = 0
     with open(args.out, "w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=["lat", "lng", "region", "name", "url", "place_id"])
         w.writeheader()
-        for row in results:
-            w.writerow(row)
-
-    print(f"\nDone. {len(results)} shelters available for {start_dt.date()} for {nights} nights.")
+        try:
+            for idx, fut in enumerate(asyncio.as_completed([check(p) for p in places]), 1):
+                p, pid, outcome = await fut
+                print(f"\n[{idx}/{len(places)}] {p.title}  {p.url}")
+                if pid is None:
+                    print("  Skipping (missing or invalid place_id)")
+                    continue
+                if isinstance(outcome, Exception):
+                    print("  Error:", outcome)
+                    continue
+                available, needed, hits, booked_count = outcome
+                if not args.quiet:
+                    print(f"  place_id={pid} needs={needed} booked_hits={hits} booked_count={booked_count}")
+                if available:
+                    w.writerow({
+                        "lat": p.lat,
+                        "lng": p.lng,
+                        "region": p.region,
+                        "name": p.title,
+                        "url": p.url,
+                        "place_id": pid,
+                    })
+                    f.flush()
+                    found += 1
+                    print("  AVAILABLE ->", p.title)
+                else:
+                    print("  Not available for your range.")
+        finally:
+            if bookings_cache is not None:
+                save_bookings_cache(args.bookings_cache, bookings_cache)
+
+    print(f"\nDone. {found} shelters available for {start_dt.date()} for {nights} nights.")
     print(f"Saved: {args.out}")
 
 if __name__ == "__main__":
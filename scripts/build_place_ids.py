@@ -1,6 +1,6 @@
 # scripts/build_place_ids.py
-import json, re, time
-import requests
+import asyncio, importlib.util, json, random, re
+import httpx
 
 BASE = "https://book.naturstyrelsen.dk"
 LIST = f"{BASE}/includes/branding_files/shelterbooking/includes/inc_ajaxbookingplaces.asp"
@@ -13,25 +13,68 @@ HEADERS = {
 }
 # Category/type ids (not real place ids)
 TYPE_IDS = {3012, 3031, 3091}
+# HTTP/2 only if the optional h2 package (httpx[http2]) is installed
+HTTP2 = importlib.util.find_spec("h2") is not None
+# Detail pages fetched concurrently per batch
+CHUNK = 20
+# Listing pages fetched speculatively per round
+PAGE_BATCH = 5
+# Retry timeouts/dropped connections and 429/5xx with jittered backoff
+RETRY_ATTEMPTS = 4
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-def get_json(url, params):
-    r = requests.get(url, params=params, headers=HEADERS, timeout=30)
+async def get_with_retries(client, url, **kwargs):
+    for attempt in range(1, RETRY_ATTEMPTS + 1):
+        try:
+            r = await client.get(url, **kwargs)
+            if r.status_code not in RETRY_STATUS or attempt == RETRY_ATTEMPTS:
+                return r
+        except httpx.TransportError:
+            if attempt == RETRY_ATTEMPTS:
+                raise
+        await asyncio.sleep(random.uniform(0, min(3.0, 0.3 * 2 ** attempt)))
+
+def guess_encoding(content):
+    # Used when the response declares no charset: UTF-8 if valid, else cp1252 (Latin-1)
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+async def get_json(client, url, params):
+    r = await get_with_retries(client, url, params=params, headers=HEADERS, timeout=30)
     r.raise_for_status()
-    # Endpoint sometimes returns text/html content-type with JSON body
-    return r.json() if "application/json" in r.headers.get("content-type","").lower() else json.loads(r.text)
+    # Endpoint sometimes returns text/html content-type with JSON body, and may be
+    # Latin-1; r.text decodes with the declared charset or guess_encoding
+    return json.loads(r.text)
 
-def fetch_all_slugs():
+async def fetch_all_slugs(client):
+    # Pages fetched PAGE_BATCH at a time; stop at the first empty/short page and
+    # cancel requests for pages past it (they may be stuck in retry backoff)
     slugs = []
-    for p in range(1, 500):
-        data = get_json(LIST, {"pid":"0","p":str(p),"r":"50000","ps":"200","t":"1"})
-        rows = data.get("BookingPlacesList", []) or []
-        if not rows: break
-        for c in rows:
-            uri = (c.get("Uri") or "").strip().strip("/")
-            if uri:
-                slugs.append(uri)
-        if len(rows) < 200: break
-        time.sleep(0.12)  # polite
+    done = False
+    for first in range(1, 500, PAGE_BATCH):
+        pages = range(first, min(first + PAGE_BATCH, 500))
+        tasks = [asyncio.create_task(
+            get_json(client, LIST, {"pid":"0","p":str(p),"r":"50000","ps":"200","t":"1"})
+        ) for p in pages]
+        try:
+            for task in tasks:
+                data = await task
+                rows = data.get("BookingPlacesList", []) or []
+                if not rows: done = True; break
+                for c in rows:
+                    uri = (c.get("Uri") or "").strip().strip("/")
+                    if uri:
+                        slugs.append(uri)
+                if len(rows) < 200: done = True; break
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if done: break
+        await asyncio.sleep(0.12)  # polite
     return sorted(set(slugs))
 
 ID_RE = re.compile(r'inc_ajaxgetbookingsforsingleplace\.asp\?i=(\d+)|data-place-id\s*=\s*"(\d+)"|[?&]i=(\d+)', re.I)
@@ -46,37 +89,44 @@ def extract_id_from_html(html: str) -> int | None:
                 return val
     return None
 
-def fetch_html(url):
-    r = requests.get(url, headers={"User-Agent":"Mozilla/5.0"}, timeout=30)
+async def fetch_html(client, url):
+    r = await get_with_retries(client, url, timeout=30)
     r.raise_for_status()
     return r.text
 
-def main():
-    print("Collecting slugs…", flush=True)
-    slugs = fetch_all_slugs()
-    print(f"Found {len(slugs)} slugs")
+async def resolve_slug(client, slug):
+    try:
+        return slug, extract_id_from_html(await fetch_html(client, f"{BASE}/sted/{slug}/"))
+    except Exception as e:
+        print(f"  Could not fetch {slug}: {e}")
+        return slug, None
 
-    out = {}
-    misses = 0
-    for i, slug in enumerate(slugs, 1):
-        url = f"{BASE}/sted/{slug}/"
-        try:
-            html = fetch_html(url)
-            pid = extract_id_from_html(html)
-            if pid:
-                out[slug] = pid
-            else:
-                misses += 1
-        except Exception:
-            misses += 1
-        if i % 25 == 0:
-            print(f"  {i}/{len(slugs)} processed… ids so far: {len(out)}")
-        time.sleep(0.07)  # polite
+async def main_async():
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+    async with httpx.AsyncClient(http2=HTTP2, follow_redirects=True, default_encoding=guess_encoding, limits=limits, headers={"User-Agent":"Mozilla/5.0"}) as client:
+        print("Collecting slugs…", flush=True)
+        slugs = await fetch_all_slugs(client)
+        print(f"Found {len(slugs)} slugs")
+
+        out = {}
+        misses = 0
+        for i in range(0, len(slugs), CHUNK):
+            batch = slugs[i:i + CHUNK]
+            for slug, pid in await asyncio.gather(*[resolve_slug(client, s) for s in batch]):
+                if pid:
+                    out[slug] = pid
+                else:
+                    misses += 1
+            print(f"  {i + len(batch)}/{len(slugs)} processed… ids so far: {len(out)}")
+            await asyncio.sleep(0.07)  # polite
 
     print(f"Resolved IDs: {len(out)}; misses: {misses}")
     with open("data/place_ids.json", "w", encoding="utf-8") as f:
         json.dump(out, f, ensure_ascii=False, indent=2)
     print("Wrote data/place_ids.json")
 
+def main():
+    asyncio.run(main_async())
+
 if __name__ == "__main__":
     main()